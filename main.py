@@ -4,6 +4,7 @@ import sys
 from concurrent.futures import ThreadPoolExecutor
 from plugins import npm, pypi, maven, cargo
 from utils import ensure_directories, print_stats
+from snapshot import snapshot_and_diff
 
 def main():
     parser = argparse.ArgumentParser(description="DepHunt: Multi-Ecosystem Package Bulk Downloader")
@@ -23,6 +24,8 @@ def main():
                         help="Number of concurrent downloads (default: 10)")
     parser.add_argument("--resume", action="store_true",
                         help="Resume previous download operation")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Snapshot stored metadata and report changes since the previous snapshot")
     
     args = parser.parse_args()
     
@@ -79,6 +82,10 @@ def main():
     
     # Print summary statistics
     print_stats(args.output_dir, args.ecosystems)
+    
+    # Diff against the previous snapshot if requested
+    if args.snapshot:
+        snapshot_and_diff(args.output_dir, args.ecosystems)
 
 if __name__ == "__main__":
     main()
@@ -4,6 +4,7 @@ import time
 import requests
 import xml.etree.ElementTree as ET
 from utils import save_json, load_json, download_with_retry, parallel_download
+from snapshot import mark_dirty
 from tqdm import tqdm
 
 class PackageDownloader:
@@ -63,6 +64,7 @@ class PackageDownloader:
                         "group_id": group_id,
                         "artifact_id": artifact_id,
                         "latest_version": latest_version,
+                        "versions": [v.text for v in root.findall(".//versioning/versions/version") if v.text],
                         "pom_content": pom_response.text
                     }
                     
@@ -79,6 +81,8 @@ class PackageDownloader:
                 print(f"Error downloading Maven package {package}: {str(e)}")
                 failed.append(package)
         
+        # Metadata files are stored as group_artifact.json
+        mark_dirty(self.output_dir, [pkg.replace(":", "_") for pkg in successful])
         print(f"Downloaded {len(successful)} Maven packages successfully")
         if failed:
             print(f"Failed to download {len(failed)} packages")
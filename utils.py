@@ -11,12 +11,24 @@ def ensure_directories(base_dir, ecosystems):
         os.makedirs(os.path.join(base_dir, ecosystem, "metadata"), exist_ok=True)
         os.makedirs(os.path.join(base_dir, ecosystem, "indexes"), exist_ok=True)
 
-def save_json(data, filepath):
-    """Save data as JSON to the specified path"""
+def save_json(data, filepath, indent=2):
+    """Save data as JSON to the specified path.
+
+    Identical content is not rewritten, so a file's mtime only moves when
+    its data actually changed.
+    """
     try:
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        content = json.dumps(data, indent=indent)
+        if os.path.exists(filepath):
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    if f.read() == content:
+                        return True
+            except (OSError, UnicodeDecodeError):
+                pass
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+            f.write(content)
         return True
     except Exception as e:
         print(f"Error saving JSON to {filepath}: {str(e)}")